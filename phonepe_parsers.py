@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+phonepe_parsers.py
+
+Column parsers for PhonePe Pulse JSON documents, split out of etl_load_phonepe.py
+so they can be compiled. The annotations let mypyc emit native code for the
+loops and dict lookups:
+
+    mypyc phonepe_parsers.py
+
+This builds an extension module next to the source; `import phonepe_parsers`
+picks it up transparently and falls back to this file when it is absent.
+"""
+import sys
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# A parser's output: one list per table column, in insert order (COLUMNS in
+# etl_load_phonepe.py), so batches go to Arrow without a per-row dict or tuple.
+Columns = List[List[Any]]
+
+# ---- Helpers ----
+def _intern(s: Any) -> Any:
+    # dimension strings (states, types) repeat across every file; share one object each
+    return sys.intern(s) if isinstance(s, str) else s
+
+def _data(j: Any) -> Any:
+    # top-level "data" of a document; None for documents that are not JSON objects
+    return j.get("data") if isinstance(j, dict) else None
+
+def _columns(
+        source: str, country: Optional[str], state: Optional[str], districts: List[Any],
+        year: Optional[int], quarter: Optional[int], *values: List[Any]) -> Columns:
+    # the file context is the same for every row, so it is repeated rather than appended
+    n = len(districts)
+    return [[source] * n, [country] * n, [state] * n, districts, [year] * n, [quarter] * n, *values]
+
+# ---- Parsers adjusted to produce columns matching the new tables ----
+
+def parse_aggregated_transaction(
+        j: Any, country: Optional[str], state: Optional[str], district: Optional[str],
+        year: Optional[int], quarter: Optional[int], source: str) -> Columns:
+    types: List[Any] = []
+    counts: List[Any] = []
+    amounts: List[Any] = []
+    data = _data(j)
+    tdata = (data.get("transactionData") if isinstance(data, dict) else None) or []
+    for rec in tdata:
+        instruments = rec.get("paymentInstruments", [])
+        # PhonePe files nearly always carry a TOTAL instrument; summing is the rare fallback
+        totals = next((i for i in instruments if i.get("type") == "TOTAL"), None)
+        total_count: Any
+        total_amount: Any
+        if totals is not None:
+            total_count = totals.get("count")
+            total_amount = totals.get("amount")
+        else:
+            try:
+                total_count = sum(int(i.get("count") or 0) for i in instruments)
+            except Exception:
+                total_count = None
+            try:
+                total_amount = sum(float(i.get("amount") or 0) for i in instruments)
+            except Exception:
+                total_amount = None
+        types.append(_intern(rec.get("name")))
+        counts.append(total_count if total_count not in (None, "") else None)
+        amounts.append(total_amount if total_amount not in (None, "") else None)
+    return _columns(source, country, state, [district] * len(types), year, quarter,
+                    types, counts, amounts)
+
+def parse_aggregated_user(
+        j: Any, country: Optional[str], state: Optional[str], district: Optional[str],
+        year: Optional[int], quarter: Optional[int], source: str) -> Columns:
+    """
+    Two common shapes:
+      - data contains top-level registeredUsers, appOpens, activeUsers (single summary)
+      - data contains usersByDevice list (per-device). We'll sum counts to produce aggregated totals.
+    """
+    registered: List[Any] = []
+    opens: List[Any] = []
+    active: List[Any] = []
+    data = _data(j) or {}
+    # Preferred: top level totals
+    if isinstance(data, dict) and any(k in data for k in ("registeredUsers", "appOpens", "activeUsers")):
+        registered.append(data.get("registeredUsers") or 0)
+        opens.append(data.get("appOpens") or 0)
+        active.append((data.get("activeUsers") or 0) if data.get("activeUsers") is not None else None)
+    else:
+        # Fallback: sum devices if present
+        users_by_device = data.get("usersByDevice") if isinstance(data, dict) else None
+        if isinstance(users_by_device, list) and users_by_device:
+            total_registered = 0
+            total_app_opens = 0
+            for rec in users_by_device:
+                # rec may have registeredUsers or count or registered
+                total_registered += int(rec.get("registeredUsers") or rec.get("count") or 0)
+                total_app_opens += int(rec.get("appOpens") or rec.get("appOpensCount") or 0)
+            registered.append(total_registered)
+            opens.append(total_app_opens)
+            active.append(None)
+    return _columns(source, country, state, [district] * len(registered), year, quarter,
+                    registered, opens, active)
+
+
+def parse_aggregated_insurance(
+        j: Any, country: Optional[str], state: Optional[str], district: Optional[str],
+        year: Optional[int], quarter: Optional[int], source: str) -> Columns:
+    types: List[Any] = []
+    policies: List[Any] = []
+    premiums: List[Any] = []
+    data = _data(j)
+    if isinstance(data, dict):
+        ins_list = data.get("insurance") or data.get("insuranceData") or []
+        if isinstance(ins_list, dict):
+            ins_list = [ins_list]
+        for rec in ins_list:
+            types.append(_intern(rec.get("name") or rec.get("insuranceType")))
+            policies.append(rec.get("count") or rec.get("policies") or 0)
+            premiums.append(rec.get("amount") or rec.get("premium") or 0.0)
+    return _columns(source, country, state, [district] * len(types), year, quarter,
+                    types, policies, premiums)
+
+ColumnBuilder = Callable[[List[Any], List[Any], List[Any], List[Any]], None]
+
+def _extend_homogeneous(
+        build: ColumnBuilder, items: List[Any],
+        names: List[Any], first: List[Any], second: List[Any]) -> None:
+    """
+    Lists are homogeneous in practice, so `build` runs without a per-item type
+    check; if a non-dict turns up, its partial values are dropped and the list
+    is rebuilt from its dict items only.
+    """
+    start = len(names)
+    try:
+        build(items, names, first, second)
+    except AttributeError:
+        del names[start:], first[start:], second[start:]
+        build([i for i in items if isinstance(i, dict)], names, first, second)
+
+def _map_transaction_columns(
+        items: List[Any], names: List[Any], counts: List[Any], amounts: List[Any]) -> None:
+    for item in items:
+        _get = item.get
+        name = _get("name") or _get("district") or _get("state") or "Unknown"
+        metric = _get("metric") or _get("values") or _get("value") or {}
+        if isinstance(metric, dict):
+            mget = metric.get
+            total_count = mget("count") or mget("totalCount") or 0
+            total_amount = mget("amount") or mget("totalAmount") or 0.0
+        else:
+            total_count = total_amount = None
+        names.append(name)
+        counts.append(total_count)
+        amounts.append(total_amount)
+
+def _map_insurance_columns(
+        items: List[Any], names: List[Any], policies: List[Any], premiums: List[Any]) -> None:
+    for item in items:
+        _get = item.get
+        names.append(_get("name") or _get("district") or "Unknown")
+        policies.append(_get("count") or _get("policies") or 0)
+        premiums.append(_get("amount") or _get("premium") or 0.0)
+
+def parse_map_json(
+        j: Any, kind: str, country: Optional[str], state: Optional[str],
+        year: Optional[int], quarter: Optional[int], source: str) -> Columns:
+    """
+    Return columns appropriate for the three map tables based on 'kind':
+      - kind == 'transaction' -> map_map (total_tx_count/amount)
+      - kind == 'user' -> map_user (registered_users/app_opens)
+      - kind == 'insurance' -> map_insurance (total_policies/total_premium)
+    The PhonePe JSON varies a lot; handle common patterns.
+    """
+    names: List[Any] = []
+    first: List[Any] = []
+    second: List[Any] = []
+    data = _data(j) or {}
+
+    # Transaction map files often have hoverDataList or data -> hoverDataList
+    if kind == "transaction":
+        candidates: List[Any] = []
+        if isinstance(data, dict):
+            for k in ("hoverDataList", "data", "hoverData", "states"):
+                if k in data and isinstance(data[k], list):
+                    candidates.append(data[k])
+        if not candidates and isinstance(data, list):
+            candidates = [data]
+        for cand in candidates:
+            _extend_homogeneous(_map_transaction_columns, cand, names, first, second)
+
+    # User map files often have hoverData as a dict: { "DistrictName": {registeredUsers:..., appOpens:...}, ... }
+    elif kind == "user":
+        h = (data.get("hoverData") if isinstance(data, dict) else None) or {}
+        if isinstance(h, dict):
+            for name, metric in h.items():
+                if not isinstance(metric, dict):
+                    continue
+                names.append(name)
+                first.append(metric.get("registeredUsers") or metric.get("registered") or 0)
+                second.append(metric.get("appOpens") or metric.get("appOpensCount") or 0)
+
+    # Insurance map: similar to transactions but different metric names
+    elif kind == "insurance":
+        # find lists or dicts
+        candidates = []
+        if isinstance(data, dict):
+            for k in ("hoverDataList", "insurance", "data"):
+                if k in data:
+                    candidates.append(data[k])
+        for cand in candidates:
+            if isinstance(cand, list):
+                _extend_homogeneous(_map_insurance_columns, cand, names, first, second)
+            elif isinstance(cand, dict):
+                for name, metric in cand.items():
+                    if not isinstance(metric, dict):
+                        continue
+                    names.append(name)
+                    first.append(metric.get("count") or metric.get("policies") or 0)
+                    second.append(metric.get("amount") or metric.get("premium") or 0.0)
+
+    return _columns(source, country, state, names, year, quarter, first, second)
+
+def parse_top_json(
+        j: Any, kind: str, country: Optional[str], state: Optional[str],
+        year: Optional[int], quarter: Optional[int], source: str) -> Columns:
+    """
+    Extract ranked lists from top JSONs.
+    For each item, produce columns appropriate for:
+      - top_user (registered_users/app_opens)
+      - top_map (total_tx_count/amount)
+      - top_insurance (total_policies/total_premium)
+    """
+    names: List[Any] = []
+    pincodes: List[Any] = []
+    ranks: List[Any] = []
+    first: List[Any] = []
+    second: List[Any] = []
+    data = _data(j) or {}
+
+    # Yield lists in nested dicts depth-first, in key order, with an explicit iterator stack
+    def find_lists(d: Dict[str, Any]) -> Iterator[List[Any]]:
+        stack: List[Iterator[Any]] = [iter(d.values())]
+        while stack:
+            for v in stack[-1]:
+                if isinstance(v, list):
+                    yield v
+                elif isinstance(v, dict):
+                    stack.append(iter(v.values()))
+                    break
+            else:
+                stack.pop()
+
+    lists: Iterable[List[Any]]
+    if kind not in ("user", "transaction", "insurance"):
+        lists = []
+    elif isinstance(data, dict):
+        lists = find_lists(data)
+    elif isinstance(data, list):
+        lists = [data]
+    else:
+        lists = []
+
+    for lst in lists:
+        for item in lst:
+            if not isinstance(item, dict):
+                continue
+            names.append(item.get("name") or item.get("district") or item.get("state"))
+            pincodes.append(item.get("pincode") or item.get("pin"))
+            ranks.append(item.get("rank") or item.get("position") or 0)
+            if kind == "user":
+                first.append(item.get("registeredUsers") or item.get("count") or 0)
+                second.append(item.get("appOpens") or 0)
+            elif kind == "transaction":
+                first.append(item.get("count") or item.get("transactions") or 0)
+                second.append(item.get("amount") or item.get("value") or 0.0)
+            else:
+                first.append(item.get("count") or item.get("policies") or 0)
+                second.append(item.get("amount") or item.get("premium") or 0.0)
+    return _columns(source, country, state, names, year, quarter, pincodes, ranks, first, second)